@@ -0,0 +1,18 @@
+# Production server settings, run from the project root with: gunicorn -c gunicorn.conf.py
+# (gunicorn is not available on Windows; use python -m src.project there)
+import os
+
+from src.database.databaseManager import DB_POOL_MAX_CONNECTIONS
+
+wsgi_app = "src.project:create_app()"
+bind = "127.0.0.1:5000"
+
+# The selected database and the current query plan live in the server process, so requests must all reach the same
+# worker. Concurrency comes from threads instead: EXPLAIN calls block on the database and release the GIL meanwhile.
+workers = 1
+worker_class = "gthread"
+# Never more threads than pooled database connections, so concurrent EXPLAINs do not wait on the pool
+threads = min(DB_POOL_MAX_CONNECTIONS, (os.cpu_count() or 1) * 4)
+
+keepalive = 5
+timeout = 120
@@ -26,6 +26,7 @@ import { Welcome } from '../components/Welcome/Welcome';
 
 export default function HomePage() {
   const [selectedDatabase, setSelectedDatabase] = useState<string | null>(null);
+  const [sessionId, setSessionId] = useState<string>(''); // Issued by the backend when a database is selected
   const [databases, setDatabases] = useState<{ value: string; label: string }[]>([]);
   const [modifiedSQL, setModifiedSQL] = useState<string>('');
   const [qepData, setQepData] = useState<any | null>(null);
@@ -78,8 +79,9 @@ export default function HomePage() {
       const data = await response.json();
       setNotification({ message: 'Database selected successfully!', show: true });
 
-      // Update the selected database in the state
+      // Update the selected database and the session the backend keeps its state under
       setSelectedDatabase(value);
+      setSessionId(data.sessionId);
       setLoading(false); // Hide loading modal
     } catch (error) {
       console.error('Error selecting database:', error);
@@ -111,6 +113,7 @@ export default function HomePage() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-Id': sessionId,
         },
         body: JSON.stringify({ query }), // send query in the request body
       });
@@ -215,7 +218,12 @@ export default function HomePage() {
           {/* Right side: QEP Panel or Message */}
           <Grid.Col span={8} mt="lg">
             {selectedDatabase && qepData ? (
-              <QEPPanel applyWhatIfChanges={applyWhatIfChanges} qepData={qepData} query={query} />
+              <QEPPanel
+                applyWhatIfChanges={applyWhatIfChanges}
+                qepData={qepData}
+                query={query}
+                sessionId={sessionId}
+              />
             ) : (
               <Box
                 style={{
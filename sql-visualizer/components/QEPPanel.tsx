@@ -25,11 +25,12 @@ interface QEPPanelProps {
   applyWhatIfChanges: (newSQL: string) => void;
   qepData: any | null;
   query: string; // Add query as a prop
+  sessionId: string; // Session id the backend issued when the database was selected
 }
 type SelectedNode = { id: string; type: string } | null;
 type SelectedNodeOrderChange = { id: string; type: string }[];
 
-export default function QEPPanel({ applyWhatIfChanges, qepData, query }: QEPPanelProps) {
+export default function QEPPanel({ applyWhatIfChanges, qepData, query, sessionId }: QEPPanelProps) {
   const [qepTreeData, setQepTreeData] = useState<any | null>(null);
   const [modifiedTreeData, setModifiedTreeData] = useState<any | null>(null);
   const [selectedNode, setSelectedNode] = useState<any | null>(null);
@@ -259,6 +260,7 @@ export default function QEPPanel({ applyWhatIfChanges, qepData, query }: QEPPane
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-Id': sessionId,
         },
         body: JSON.stringify(requestBody),
       });
@@ -334,6 +336,7 @@ export default function QEPPanel({ applyWhatIfChanges, qepData, query }: QEPPane
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-Id': sessionId,
         },
         body: JSON.stringify({ modifications }),
       });
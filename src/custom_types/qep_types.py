@@ -1,18 +1,29 @@
 from dataclasses import dataclass
 from enum import Enum, auto, EnumMeta
-from typing import Set, Tuple, List
+from typing import FrozenSet, Set, Tuple, List
+
+
+def _substrings(value: str) -> Set[str]:
+    n = len(value)
+    return {value[i:j] for i in range(n + 1) for j in range(i, n + 1)}
 
 
 class MetaEnum(EnumMeta):
+    def __new__(metacls, cls, bases, classdict, **kwds):
+        enum_cls = super().__new__(metacls, cls, bases, classdict, **kwds)
+        # Precompute everything `in` can match: member names, plus every substring of the member values
+        # (or, for members whose value is another enum, that enum's lookup set)
+        lookup = set(enum_cls.__members__)
+        for member in enum_cls.__members__.values():
+            if isinstance(member.value, MetaEnum):
+                lookup |= member.value._lookup
+            else:
+                lookup |= _substrings(member.value)
+        enum_cls._lookup = frozenset(lookup)
+        return enum_cls
+
     def __contains__(self, item):
-        if item in self.__members__:
-            return True
-        else:
-            # Check in the values of the members
-            for member in self.__members__.values():
-                if item in member.value:
-                    return True
-            return False
+        return item in self._lookup
 
 
 class BaseEnum(Enum, metaclass=MetaEnum):
@@ -38,12 +49,12 @@ class NodeType(BaseEnum):
     JOIN = JoinType
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TypeModification:
     node_type: NodeType
     original_type: str  # Original scan or join type
     new_type: str  # New scan or join type
-    tables: Set[str]  # Single table for scan, two tables for join
+    tables: FrozenSet[str]  # Single table for scan, two tables for join
     node_id: str      # unique node id to identify the node in the QEP
 
     def __post_init__(self):
@@ -54,7 +65,7 @@ class TypeModification:
             raise ValueError("Join modifications must specify 2 or more tables")
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class JoinOrderModificationBase:
     @staticmethod
     def is_join(to_check) -> bool:
@@ -66,7 +77,7 @@ class JoinOrderModificationBase:
             else:
                 return True
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class InterJoinOrderModificationSpecced(JoinOrderModificationBase):
     # Join order modification with specified join custom_types and orders to identify nodes involved
     join_order_1: Tuple[str, str]
@@ -85,21 +96,21 @@ class InterJoinOrderModificationSpecced(JoinOrderModificationBase):
             raise ValueError(f"Invalid join type: {self.join_type_2}")
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class InterJoinOrderModification(JoinOrderModificationBase):
     # Join order modification with node id
     join_node_1_id: str
     join_node_2_id: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class IntraJoinOrderModificationSpecced:
     # Join order modification with specified join custom_types and orders to identify nodes involved
     join_order: Tuple[str, str]
     join_type: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class IntraJoinOrderModification:
     join_node_id: str
 
@@ -1,21 +1,76 @@
 import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 
-import psycopg2
+import orjson
+from psycopg2.extras import register_default_json
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
 from src.settings.filepaths import DB_SETTINGS_PATH
 
+logger = logging.getLogger(__name__)
+
+# Bounds of the EXPLAIN result cache shared by every DatabaseManager
+QEP_CACHE_SIZE = 256
+QEP_CACHE_TIMEOUT_SECONDS = 60.0
+
+# Rows fetched per round trip when streaming query results
+STREAM_ITERSIZE = 2000
+
+# Most connections each database's pool opens (DB_POOL_MAX_CONNECTIONS environment variable). The production server
+# runs at most this many request threads, so a request normally finds a free connection
+DB_POOL_MAX_CONNECTIONS = int(os.environ.get("DB_POOL_MAX_CONNECTIONS", "16"))
+# Seconds a query waits for a connection to be handed back when all of them are in use
+DB_POOL_TIMEOUT_SECONDS = 30.0
+
+# EXPLAIN (FORMAT JSON) returns its plan as a json column, which psycopg2 decodes on fetch; decode it with orjson
+register_default_json(globally=True, loads=orjson.loads)
+
+# Connection pools shared by every DatabaseManager in the process, keyed by database name, each with a semaphore
+# counting its free connections (ThreadedConnectionPool.getconn raises instead of waiting when the pool is empty)
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _get_pool(db_name, settings):
+    """Get the (connection pool, free connection semaphore) of a database, creating them on first use."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(db_name)
+        if pool is None:
+            pool = _POOLS[db_name] = (
+                ThreadedConnectionPool(
+                    minconn=min(2, DB_POOL_MAX_CONNECTIONS),  # kept open between requests; extras are closed on return
+                    maxconn=DB_POOL_MAX_CONNECTIONS,
+                    user=settings['DB_USER'],
+                    password=settings['DB_PASSWORD'],
+                    host=settings['DB_HOST'],
+                    port=settings['DB_PORT'],
+                    database=settings['DB']
+                ),
+                threading.BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
+            )
+        return pool
+
+
+# (database name, EXPLAIN statement): (time cached, result), least recently used first. Shared by every
+# DatabaseManager in the process like _POOLS, so sessions planning the same query reuse each other's EXPLAIN.
+# The UI re-plans the same query text on every render; entries expire so plans pick up changed statistics
+_QEP_CACHE = OrderedDict()
+_QEP_CACHE_LOCK = threading.Lock()
+
 
 class DatabaseManager:
     def __init__(self, db_name):
+        self.db_name = db_name
         self.settings = self.load_db_settings(db_name)
 
-        self.connection = psycopg2.connect(
-            user=self.settings['DB_USER'],
-            password=self.settings['DB_PASSWORD'],
-            host=self.settings['DB_HOST'],
-            port=self.settings['DB_PORT'],
-            database=self.settings['DB']
-        )
+        # Reuse pooled connections instead of opening a new one per selection
+        self.pool, self._free_connections = _get_pool(db_name, self.settings)
 
     @staticmethod
     def load_db_settings(db_name):
@@ -24,20 +79,73 @@ class DatabaseManager:
             settings = databases[db_name]
             return settings
 
-    def execute_query(self, query):
-        cursor = self.connection.cursor()
-        cursor.execute(query)
-        result = cursor.fetchall()
-        return result
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, waiting up to DB_POOL_TIMEOUT_SECONDS for one to be handed back."""
+        if not self._free_connections.acquire(timeout=DB_POOL_TIMEOUT_SECONDS):
+            raise PoolError(f"All {DB_POOL_MAX_CONNECTIONS} database connections are busy, try again later")
+        try:
+            connection = self.pool.getconn()
+            try:
+                yield connection
+            finally:
+                # putconn rolls back an open or failed transaction before the connection is reused
+                self.pool.putconn(connection)
+        finally:
+            self._free_connections.release()
+
+    def _fetch_all(self, query, params=None):
+        """Run a query on a pooled connection with its own cursor, then hand the connection back."""
+        with self._connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    @contextmanager
+    def stream_query(self, query, params=None, itersize=STREAM_ITERSIZE):
+        """
+        Run a query on a server-side cursor and yield it as an iterator of rows, fetched itersize rows per round trip,
+        so large result sets are not fetched and decoded all at once. Use it as
+            with db_manager.stream_query(query) as rows:
+                for row in rows: ...
+        The pooled connection is held for the whole with block and handed back when it exits, even if the rows
+        were not all read.
+        """
+        with self._connection() as connection:
+            with connection.cursor(name=f"c_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                yield cursor
+
+    def execute_query(self, query, params=None):
+        """
+        Execute a query, passing any values through params (%s placeholders) instead of formatting them in.
+        For large result sets use stream_query instead.
+        """
+        return self._fetch_all(query, params)
 
     def get_qep(self, query):
-        cursor = self.connection.cursor()
         to_execute = "EXPLAIN (FORMAT JSON) " + query
         print("========== TO EXECUTE ==========\n", to_execute)
-        cursor.execute(to_execute)
-        result = cursor.fetchall()
+        cache_key = (self.db_name, to_execute)
+        with _QEP_CACHE_LOCK:
+            cached = _QEP_CACHE.get(cache_key)
+            if cached is not None:
+                cached_at, result = cached
+                if time.monotonic() - cached_at < QEP_CACHE_TIMEOUT_SECONDS:
+                    _QEP_CACHE.move_to_end(cache_key)
+                    logger.debug("EXPLAIN cache hit: %s", to_execute)
+                    return result
+                del _QEP_CACHE[cache_key]
+
+        result = self._fetch_all(to_execute)
         print("========= Result ========= ")
         print(result)
+
+        with _QEP_CACHE_LOCK:
+            _QEP_CACHE[cache_key] = (time.monotonic(), result)
+            _QEP_CACHE.move_to_end(cache_key)
+            while len(_QEP_CACHE) > QEP_CACHE_SIZE:
+                _QEP_CACHE.popitem(last=False)
         return result
 
 
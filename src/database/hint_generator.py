@@ -3,117 +3,105 @@ from typing import Dict, Set, List, Tuple
 import networkx as nx
 import re
 
-from src.custom_types.qep_types import JoinType, ScanType
+
+# Maps join order string "[[a, b], c]" to pg_hint_plan Leading syntax "((a b) c)" in one pass
+_LEADING_TRANSLATION = str.maketrans({'[': '(', ']': ')', ',': None})
+
+# Splits a scan/join hint such as "HashJoin(l s o)" into its name and space separated aliases
+_HINT_PATTERN = re.compile(r'(\w+)\(([^()]*)\)')
 
 
 class HintConstructor:
+    # Node type -> pg_hint_plan hint name, shared by all instances
+    scan_hint_map = {
+        'Seq Scan': 'SeqScan',
+        'Index Scan': 'IndexScan',
+        'Index Only Scan': 'IndexOnlyScan',
+        'Bitmap Heap Scan': 'BitmapScan',
+        'Tid Scan': 'TidScan'
+    }
+    join_hint_map = {
+        'Nested Loop': 'NestLoop',
+        'Hash Join': 'HashJoin',
+        'Merge Join': 'MergeJoin'
+    }
+    join_hint_names = frozenset(join_hint_map.values())
+
     def __init__(self, graph: nx.DiGraph, alias_map):
         """Initialize with QEP graph and hint mappings."""
         self.graph = graph
-        self.scan_hint_map = {
-            'Seq Scan': 'SeqScan',
-            'Index Scan': 'IndexScan',
-            'Index Only Scan': 'IndexOnlyScan',
-            'Bitmap Heap Scan': 'BitmapScan',
-            'Tid Scan': 'TidScan'
-        }
-        self.join_hint_map = {
-            'Nested Loop': 'NestLoop',
-            'Hash Join': 'HashJoin',
-            'Merge Join': 'MergeJoin'
-        }
         self.alias_map = alias_map # Will store table_name: alias mappings
+        self._nodes = list(self.graph.nodes(data=True))  # (node, node_data) snapshot shared by all node passes
+        self._parents = {child: parent for parent, child in self.graph.edges()}  # plan trees have one parent per node
         self.root = self._get_root()
 
     def _get_root(self):
         """Get root node of the graph."""
-        for node, node_data in self.graph.nodes(True):
-            if node_data['is_root']:
-                return node
+        root = self.graph.graph.get('root')
+        if root is not None:
+            return root
+        return next((node for node, node_data in self._nodes if node_data['is_root']), None)
 
     @staticmethod
     def _format_join_order_str(join_order_str: str):
-        return f"({join_order_str.replace('[', '(').replace(']', ')').replace(',', '')})"
+        return f"({join_order_str.translate(_LEADING_TRANSLATION)})"
 
     def _construct_join_order(self) -> str:
         """Construct join order hint from root node join_order attribute (str)"""
         join_order_str = self._format_join_order_str(self.graph.nodes[self.root]['join_order'])
         return f'LEADING{join_order_str}'
 
-    def _get_join_hints(self) -> List[str]:
-        """Get join type hints from the graph."""
-        hints = []
-        for node, node_data in self.graph.nodes(data=True):
-            join_type = node_data['node_type']
-            if join_type in JoinType and join_type != "Hash":
-                print("join_type", join_type)
-                join_aliases = node_data['_join_table_aliases']
-                hints.append(f'{self.join_hint_map[join_type]}({" ".join(join_aliases)})')
-        return hints
-
     def check_subquery(self, node) -> bool:
         """Check if the node is a subquery node based on ancestry"""
-        for node in nx.ancestors(self.graph, node):
-            if self.graph.nodes[node]['_subplan']:
-                return True
-
-    def _get_scan_hints(self) -> List[str]:
-        """Get scan type hints from the graph."""
-        hints = []
-        for node, node_data in self.graph.nodes(data=True):
+        # The parser marks every descendant of a subplan as _subplan, so checking the parent covers all ancestors
+        parent = self._parents.get(node)
+        return parent is not None and self.graph.nodes[parent]['_subplan']
+
+    def _collect_hints(self) -> Tuple[List[str], List[str]]:
+        """Get join type and scan type hints from the graph in a single pass."""
+        join_hints = []
+        scan_hints = []
+        for node, node_data in self._nodes:
+            node_type = node_data['node_type']
+            if node_type in self.join_hint_map:
+                print("join_type", node_type)
+                join_hints.append(f"{self.join_hint_map[node_type]}({node_data['_join_aliases_str']})")
             # ignore subquery nodes
-            if self.check_subquery(node):
-                continue
-            scan_type = node_data['node_type']
-            if scan_type in ScanType:
-                scan_table = next(iter(node_data['aliases']))
-                hints.append(f'{self.scan_hint_map[scan_type]}({scan_table})')
-
-        return hints
-
-    @staticmethod
-    def _find_innermost_parens(s):
-        """Find the position of the innermost complete set of parentheses."""
-        stack = []
-        for i, char in enumerate(s):
-            if char == '(':
-                stack.append(i)
-            elif char == ')':
-                start = stack.pop()
-                # Check if this is the innermost pair by looking for ( between start and end
-                if '(' not in s[start + 1:i]:
-                    return start, i
-        return None, None
+            elif node_type in self.scan_hint_map and not self.check_subquery(node):
+                scan_table = node_data['_aliases_sorted'][0]
+                scan_hints.append(f'{self.scan_hint_map[node_type]}({scan_table})')
+        return join_hints, scan_hints
 
     def _parse_nested_expression(self, expr):
         """Parse nested parentheses expressions like ((((l s) o) c)) into pairs."""
 
-        expr = expr.strip()
         results = []
-        working_expr = expr
         last_result = None
 
-        while '(' in working_expr:
-            start, end = self._find_innermost_parens(working_expr)
-            if start is None:
-                break
-
-            # Extract and parse the innermost content
-            inner = working_expr[start + 1:end]
-            parts = inner.strip().split()
-
-            if len(parts) == 2:
-                if last_result is None:
-                    # First pair (l s)
-                    results.append(f"({parts[0]} and {parts[1]})")
-                    last_result = f"({parts[0]} {parts[1]})"
-                else:
-                    # Following pairs
-                    results.append(f"{last_result} and {parts[-1]}")
-                    last_result = f"({last_result} {parts[-1]})"
-
-            # Replace the parsed section with a placeholder
-            working_expr = working_expr[:start] + "x" + working_expr[end + 1:]
+        # One left-to-right pass: each '(' opens a buffer, each ')' closes the innermost one and leaves an "x"
+        # placeholder in its parent, so pairs come out innermost-first without rebuilding the string per pair
+        open_parts = []
+        for char in expr.strip():
+            if char == '(':
+                open_parts.append([])
+            elif char == ')':
+                if not open_parts:
+                    break
+                parts = ''.join(open_parts.pop()).split()
+                if open_parts:
+                    open_parts[-1].append('x')
+
+                if len(parts) == 2:
+                    if last_result is None:
+                        # First pair (l s)
+                        results.append(f"({parts[0]} and {parts[1]})")
+                        last_result = f"({parts[0]} {parts[1]})"
+                    else:
+                        # Following pairs
+                        results.append(f"{last_result} and {parts[-1]}")
+                        last_result = f"({last_result} {parts[-1]})"
+            elif open_parts:
+                open_parts[-1].append(char)
 
         return results
 
@@ -121,15 +109,12 @@ class HintConstructor:
         """Generate explanation for each hint."""
         hint_explain_d = {}
         for hint in hint_lst:
-            if "Join" in hint or "Nest" in hint:
+            if hint[:hint.find('(')] in self.join_hint_names:
                 print("is join hint:", hint)
                 # Is Join hint
-                _split = hint.split("(")
-                join_type = _split[0]
-                relations_lst = _split[-1].replace(')', '').split(" ")
-                relations_str = ", ".join(relations_lst)
-                tables_lst = [self.alias_map[relation] for relation in relations_lst]
-                tables_str = ", ".join(tables_lst)
+                join_type, relations = _HINT_PATTERN.match(hint).groups()
+                relations_str = relations.replace(" ", ", ")  # single-space separated, as _collect_hints emits them
+                tables_str = ", ".join([self.alias_map[relation] for relation in relations.split(" ")])
                 hint_explanation = f"This hint specifies that the optimizer should use a {join_type} on the relations with aliases {relations_str} corresponding to tables {tables_str}."
             elif "LEADING" in hint: # is join order hint
                 join_pairs = self._parse_nested_expression(hint)
@@ -139,9 +124,8 @@ class HintConstructor:
                 final_join_pair = join_pairs[-1]
                 hint_explanation = f"This hint specifies the join order of the relations in the query plan. The first join pair is {first_join_pair}.{intermediate_join_pairs}. The final join pair is {final_join_pair}."
             else: # is Scan hint
-                _split = hint.split("(")
-                alias = _split[-1].replace(')', '')
-                hint_explanation = f"This hint specifies that the optimizer should use a {_split[0]} on the relation {self.alias_map[alias]} with alias {alias}."
+                scan_type, alias = _HINT_PATTERN.match(hint).groups()
+                hint_explanation = f"This hint specifies that the optimizer should use a {scan_type} on the relation {self.alias_map[alias]} with alias {alias}."
             hint_explain_d[hint] = hint_explanation
         return hint_explain_d
 
@@ -149,30 +133,27 @@ class HintConstructor:
         """Generate complete hint string."""
         # Generate all hints
         hints = []
-        hint_expl_d = {}
 
         # Add join order hint
         join_order = self._construct_join_order()
         if join_order:
             print("join_order", join_order)
             hints.append(join_order)
-            hint_expl_d.update(self._generate_explain([join_order]))
+
+        join_hints, scan_hints = self._collect_hints()
 
         # Add join type hints
-        join_hints = self._get_join_hints()
         if join_hints:
             print("join_hints", join_hints)
             hints.extend(join_hints)
-            hint_expl_d.update(self._generate_explain(join_hints))
 
         # Add scan hints
-        scan_hints = self._get_scan_hints()
         if scan_hints:
             print("scan_hints", scan_hints)
             hints.extend(scan_hints)
-            hint_expl_d.update(self._generate_explain(scan_hints))
-            hints.extend(scan_hints)
 
+        # Explain every hint in one pass, in the same order they appear in the hint string
+        hint_expl_d = self._generate_explain(hints)
         print("hint_expl_d:", hint_expl_d)
 
         # Combine all hints
@@ -21,19 +21,19 @@ class QEPChangeChecker:
                 # Check if node matches modification criteria
                 if modification.node_type == NodeType.SCAN:
                     # For scan nodes, check if it's a scan on the specified table
-                    node_table_aliases = set(data.get('aliases', []))
+                    node_table_aliases = data.get('_alias_set', frozenset())
                     print("node_table_aliases:", node_table_aliases, "modification.tables:", modification.tables, "node_type:", node_type, "modification.original_type:", modification.new_type)
                     if (node_type == modification.new_type and
-                            len(node_table_aliases.intersection(modification.tables)) == len(modification.tables)):
+                            node_table_aliases.issuperset(modification.tables)):
                         matching_nodes.append(node_id)
 
                 elif modification.node_type == NodeType.JOIN:
                     # print("mod node type:", modification.node_type)
                     # For join nodes, check if it involves the specified tables
-                    node_table_aliases = set(data.get('aliases', []))
+                    node_table_aliases = data.get('_alias_set', frozenset())
                     print("node_table_aliases:", node_table_aliases, "modification.tables:", modification.tables)
                     if (node_type == modification.new_type and
-                            len(node_table_aliases.intersection(modification.tables)) == len(modification.tables)):
+                            node_table_aliases.issuperset(modification.tables)):
                         matching_nodes.append(node_id)
             print("modification.node_type:", modification.node_type, NodeType.SCAN, )
             return matching_nodes[0]
@@ -1,17 +1,27 @@
-from copy import deepcopy
-from typing import List, Tuple, Union, Dict
+from typing import Iterable, List, Tuple, Union, Dict
 from collections import OrderedDict
 import networkx as nx
 from src.database.databaseManager import DatabaseManager
 from src.database.qep.qep_change_checker import QEPChangeChecker
-from src.database.qep.qep_parser import QEPParser
+from src.database.qep.qep_parser import QEPParser, NODE_CATEGORIES, format_join_order_to_string
 from src.database.qep.qep_visualizer import QEPVisualizer
 from src.custom_types.qep_types import NodeType, ScanType, JoinType, TypeModification, InterJoinOrderModification, \
     InterJoinOrderModificationSpecced, IntraJoinOrderModification, IntraJoinOrderModificationSpecced
 from src.settings.filepaths import VIZ_DIR
 
 
+def _clone_nested(value):
+    """Copy a nested list of aliases, sharing the (immutable) alias strings."""
+    if type(value) is list:
+        return [_clone_nested(item) for item in value]
+    return value
+
+
 class QEPModifier:
+    # Plan attributes holding conditions, stripped from the graph by remove_cond_attributes
+    condition_keys = frozenset(('Filter', 'Join Filter', 'Hash Cond', 'Recheck Cond', 'Index Cond', 'Merge Cond',
+                                'Cache Key'))
+
     def __init__(self, graph: nx.DiGraph, join_order: List, alias_map: Dict[str, str]):
         """
         Initialize the QueryModifier with a query execution plan graph.
@@ -19,12 +29,14 @@ class QEPModifier:
         Args:
             graph: NetworkX DiGraph representing the simplified query execution plan
         """
-        self.graph = deepcopy(graph) # Create a copy to preserve the original
+        # Copy the structure and each node's attribute dict to preserve the original. Attribute values are shared:
+        # the modifier only ever replaces them (join orders are rebuilt by _swap_or_replace_elements), never mutates them
+        self.graph = graph.copy()
         self.modifications: List[Union[TypeModification, InterJoinOrderModification, InterJoinOrderModificationSpecced, IntraJoinOrderModification, IntraJoinOrderModificationSpecced]] = []
-        self.join_order = deepcopy(join_order) # Create a copy to preserve the original
+        self.join_order = list(join_order) # Copy to preserve the original; its (join order, node id) entries are only replaced
+        # Entries of join_order are only ever replaced in place, so each join node keeps its index
+        self._join_order_index = {node_id: i for i, (_, node_id) in enumerate(self.join_order)}
         self.alias_map = alias_map
-        self.condition_keys = ['Filter', 'Join Filter', 'Hash Cond', 'Recheck Cond', 'Index Cond', 'Merge Cond',
-                               'Cache Key']
 
     def _find_matching_nodes(self, modification: TypeModification) -> List[str]:
         """
@@ -45,18 +57,18 @@ class QEPModifier:
             # Check if node matches modification criteria
             if modification.node_type == NodeType.SCAN:
                 # For scan nodes, check if it's a scan on the specified table
-                node_table_aliases = set(data.get('aliases', []))
+                node_table_aliases = data.get('_alias_set', frozenset())
                 if (node_type == modification.original_type and
-                        len(node_table_aliases.intersection(modification.tables)) == len(modification.tables) ):
+                        node_table_aliases.issuperset(modification.tables) ):
                     matching_nodes.append(node_id)
 
             elif modification.node_type == NodeType.JOIN:
                 # print("mod node type:", modification.node_type)
                 # For join nodes, check if it involves the specified tables
-                node_table_aliases = set(data.get('aliases', []))
+                node_table_aliases = data.get('_alias_set', frozenset())
                 print("node_table_aliases:", node_table_aliases)
                 if (node_type == modification.original_type and
-                        len(node_table_aliases.intersection(modification.tables)) == len(modification.tables)):
+                        node_table_aliases.issuperset(modification.tables)):
                     matching_nodes.append(node_id)
 
         return matching_nodes
@@ -71,7 +83,8 @@ class QEPModifier:
         """
         if not self.graph.has_node(node_id):
             raise ValueError(f"Node with ID {node_id} not found in the QEP Tree")
-        nx.set_node_attributes(self.graph, {node_id: {'node_type': new_type}})
+        nx.set_node_attributes(self.graph, {node_id: {'node_type': new_type,
+                                                      '_join_or_scan': NODE_CATEGORIES.get(new_type, "Unknown")}})
 
     def add_modification(self, modification: Union[TypeModification, InterJoinOrderModification, InterJoinOrderModificationSpecced, IntraJoinOrderModification, IntraJoinOrderModificationSpecced]):
         """
@@ -82,6 +95,15 @@ class QEPModifier:
         """
         self.modifications.append(modification)
 
+    def add_modifications(self, modifications: Iterable[Union[TypeModification, InterJoinOrderModification, InterJoinOrderModificationSpecced, IntraJoinOrderModification, IntraJoinOrderModificationSpecced]]):
+        """
+        Add several modifications at once, applied in the given order after any already added.
+
+        Args:
+            modifications: QueryModification objects describing the changes
+        """
+        self.modifications.extend(modifications)
+
     def clear_costs(self):
         """Set the cost of all nodes to -1."""
         for node_id in self.graph.nodes():
@@ -117,14 +139,21 @@ class QEPModifier:
         if not isinstance(nested_list, list):
             return None if nested_list != target else path
 
-        for i, item in enumerate(nested_list):
-            current_path = path + [i]
-            if item == target:
-                return current_path
-            if isinstance(item, list):
-                result = self._find_element(item, target, current_path)
-                if result is not None:
-                    return result
+        # Iterative pre-order walk: one enumerate iterator per open list, `prefix` holds the indices leading to it
+        prefix = list(path)
+        stack = [enumerate(nested_list)]
+        while stack:
+            for i, item in stack[-1]:
+                if item == target:
+                    return prefix + [i]
+                if isinstance(item, list):
+                    prefix.append(i)
+                    stack.append(enumerate(item))
+                    break
+            else:
+                stack.pop()
+                if stack:
+                    prefix.pop()
         return None
 
     @staticmethod
@@ -149,8 +178,8 @@ class QEPModifier:
         If elem2 doesn't exist, replace elem1 with elem2.
         Returns a new list with the modified elements.
         """
-        # Create a deep copy to avoid modifying the original list
-        result = deepcopy(list(nested_list))
+        # Copy every nesting level to avoid modifying the original list
+        result = [_clone_nested(item) for item in nested_list]
 
         # Find path to elem1
         path1 = self._find_element(result, elem1)
@@ -174,17 +203,6 @@ class QEPModifier:
 
         return result
 
-    def _format_join_order_to_string(self, join_order: List) -> str:
-        """Format a list of aliases to a string."""
-        if not isinstance(join_order, list):
-            return str(join_order)
-
-        elements = []
-        for item in join_order:
-            elements.append(self._format_join_order_to_string(item))
-
-        return f"[{', '.join(elements)}]"
-
     def _get_index_of_join_node(self, join_node_id: str) -> int:
         """
         Get the index of a join node in the join order list.
@@ -192,14 +210,13 @@ class QEPModifier:
         Args:
             join_node_id: ID of the join node
         """
-        for i, (join_node, node_id) in enumerate(self.join_order):
-            if node_id == join_node_id:
-                return i
+        return self._join_order_index.get(join_node_id)
 
     def _get_root(self):
-        for node, node_data in self.graph.nodes(True):
-            if node_data['is_root']:
-                return node
+        root = self.graph.graph.get('root')
+        if root is not None:
+            return root
+        return next((node for node, node_data in self.graph.nodes(True) if node_data['is_root']), None)
 
     def _swap_intra_join_order(self, modification: Union[IntraJoinOrderModification, IntraJoinOrderModificationSpecced]):
         if isinstance(modification, IntraJoinOrderModification): # get node by id
@@ -231,7 +248,7 @@ class QEPModifier:
             table_join_order_1
         ]
 
-        new_join_order_str = self._format_join_order_to_string(new_join_order)
+        new_join_order_str = format_join_order_to_string(new_join_order)
 
         left_child_node_id = None
         right_child_node_id = None
@@ -277,9 +294,9 @@ class QEPModifier:
             join_node_2_id: str = self._get_join_node_by_type_and_alias(modification.join_type_2, modification.join_order_2)
             print("join_node_2_id:", join_node_2_id)
 
-        # Copy node data
-        join_node_1_data = deepcopy(self.graph.nodes(True)[join_node_1_id])
-        join_node_2_data = deepcopy(self.graph.nodes(True)[join_node_2_id])
+        # Copy node data; a shallow copy is enough because attribute values are only ever replaced, never mutated
+        join_node_1_data = dict(self.graph.nodes[join_node_1_id])
+        join_node_2_data = dict(self.graph.nodes[join_node_2_id])
 
         print("join_node_1_data:", join_node_1_data)
         print("join_node_2_data:", join_node_2_data)
@@ -288,13 +305,13 @@ class QEPModifier:
         join_node_1_parent = None
         join_node_2_parent = None
         if not join_node_1_data['is_root']:
-            join_node_1_parent = deepcopy(list(self.graph.predecessors(join_node_1_id))[0])
+            join_node_1_parent = next(self.graph.predecessors(join_node_1_id))
         if not join_node_2_data['is_root']:
-            join_node_2_parent = deepcopy(list(self.graph.predecessors(join_node_2_id))[0])
+            join_node_2_parent = next(self.graph.predecessors(join_node_2_id))
         print("Saved parents")
         # Save children
-        join_node_1_children = deepcopy(list(self.graph.successors(join_node_1_id)))
-        join_node_2_children = deepcopy(list(self.graph.successors(join_node_2_id)))
+        join_node_1_children = list(self.graph.successors(join_node_1_id))
+        join_node_2_children = list(self.graph.successors(join_node_2_id))
 
         # Remove nodes
         self.graph.remove_node(join_node_1_id)
@@ -337,8 +354,8 @@ class QEPModifier:
 
         # print("post change join_node_2_order:", join_node_2_order)
 
-        join_order_str_1 = self._format_join_order_to_string(join_node_1_order)
-        join_order_str_2 = self._format_join_order_to_string(join_node_2_order)
+        join_order_str_1 = format_join_order_to_string(join_node_1_order)
+        join_order_str_2 = format_join_order_to_string(join_node_2_order)
 
         isRoot1 = join_node_1_data.get('is_root')
         isRoot2 = join_node_2_data.get('is_root')
@@ -375,7 +392,7 @@ class QEPModifier:
                 _join_order = self._swap_or_replace_elements(_join_order, join_on_1[0], join_on_2[0])
                 _join_order = self._swap_or_replace_elements(_join_order, join_on_1[1], join_on_2[1])
                 print("updated order:", _join_order)
-                join_order_str = self._format_join_order_to_string(_join_order)
+                join_order_str = format_join_order_to_string(_join_order)
                 other_join_order_update[node_id] = {'_join_order': _join_order, 'join_order': join_order_str}
 
                 # update join order list (class)
@@ -415,6 +432,8 @@ class QEPModifier:
 
     def get_node_positions(self) -> Dict[str, Dict[str, str]]:
         node_positions_d = {}  # {node_id: {position: 'l'/'r'/'c'}}
+        out_degree = dict(self.graph.out_degree())  # child counts from one adjacency scan
+        parent_of = {child: parent for parent, child in self.graph.edges()}  # plan trees have one parent per node
 
         for node_id, node_data in self.graph.nodes(True):
             # only care for the positions of non subquery nodes
@@ -422,9 +441,9 @@ class QEPModifier:
                 # check not root
                 if not node_data.get('is_root'):
                     # check parent if node is only child
-                    parent = list(self.graph.predecessors(node_id))[0]
+                    parent = parent_of[node_id]
                     parent_node_data = self.graph.nodes(True)[parent]
-                    if len(list(self.graph.successors(parent))) == 1: # only child
+                    if out_degree[parent] == 1: # only child
                         # therefore put 'c' for center
                         node_positions_d[node_id] = {'position': 'c'}
                     else: # not only child
@@ -447,11 +466,11 @@ class QEPModifier:
         return node_positions_d
 
     def remove_cond_attributes(self):
-        for node in self.graph.nodes():
-            attrs = list(self.graph.nodes[node].keys())
-            for attr in attrs:
-                if attr in self.condition_keys:
-                    del self.graph.nodes[node][attr]
+        condition_keys = self.condition_keys
+        # Pop the few condition keys in place rather than snapshotting and testing every attribute
+        for _, node_data in self.graph.nodes(data=True):
+            for key in condition_keys:
+                node_data.pop(key, None)
 
     def apply_modifications(self, match_node_by_id: bool = True) -> Tuple[nx.DiGraph, List]:
         """
@@ -485,13 +504,15 @@ class QEPModifier:
                     else: # is IntraJoinOrderModificationSpecced
                         self._swap_intra_join_order(modification)
 
-        # set positions of nodes
+        # Positions are computed from the finished tree, then set in the same pass over the nodes that
+        # removes their conditions and clears their costs (same result as remove_cond_attributes + clear_costs)
         node_positions_d = self.get_node_positions()
-        nx.set_node_attributes(self.graph, node_positions_d)
-
-        # remove conditions from nodes
-        self.remove_cond_attributes()
-        self.clear_costs()
+        condition_keys = self.condition_keys
+        for node_id, node_data in self.graph.nodes(data=True):
+            node_data.update(node_positions_d[node_id])
+            for key in condition_keys:
+                node_data.pop(key, None)
+            node_data['cost'] = -1
         #QEPVisualizer(self.graph).visualize(VIZ_DIR / "CANCERmodified_qep_tree.png")
         return self.graph, self.modifications
 
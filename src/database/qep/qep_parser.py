@@ -1,65 +1,99 @@
+import sys
 import uuid
 from typing import Dict, List, Set, Tuple, Any, Hashable
 
 import networkx as nx
 from networkx import DiGraph
-from networkx.algorithms.dag import descendants
 
 from src.custom_types.qep_types import NodeType, ScanType, JoinType
 import re
 
+# PostgreSQL plan node types shown as joins or scans in the frontend
+JOIN_NODE_TYPES = frozenset(["Nested Loop", "Hash Join", "Merge Join"])
+SCAN_NODE_TYPES = frozenset([
+    "Seq Scan", "Sample Scan", "Index Scan", "Index Only Scan", "Bitmap Index Scan", "Bitmap Heap Scan",
+    "Tid Scan", "Tid Range Scan", "Subquery Scan", "Function Scan", "Table Function Scan", "Values Scan",
+    "CTE Scan", "Named Tuplestore Scan", "WorkTable Scan", "Foreign Scan", "Custom Scan"
+])
+# node type -> "Join" / "Scan", stored on each node as '_join_or_scan'; anything else is "Unknown"
+NODE_CATEGORIES = {**dict.fromkeys(JOIN_NODE_TYPES, "Join"), **dict.fromkeys(SCAN_NODE_TYPES, "Scan")}
+
+# Deletes parentheses from condition strings in a single pass
+_PAREN_DELETION = str.maketrans('', '', '()')
+# Matches each whitespace separated word up to its first dot, i.e. the alias part of "alias.column"
+_WORD_PREFIX = re.compile(r'(?<!\S)[^\s.]+')
+# Deletes list brackets from formatted join order strings in a single pass
+_BRACKET_DELETION = str.maketrans('', '', '[]')
+
+
+def format_join_order_to_string(join_order: List) -> str:
+    """Format a nested list of aliases to a string such as "[a, [b, c]]"; shared with QEPModifier."""
+    if not isinstance(join_order, list):
+        return str(join_order)
+
+    return f"[{', '.join(format_join_order_to_string(item) for item in join_order)}]"
+
+
 class QEPParser:
+    # Shared by all parsers, so they are built once at import rather than per parse
+    condition_keys = ('Filter', 'Join Filter', 'Hash Cond', 'Recheck Cond', 'Index Cond', 'Merge Cond',
+                      'Cache Key')
+    # Condition keys that can name a nested loop's join pair
+    _pairing_condition_keys = tuple(key for key in condition_keys if key not in ('Join Filter', 'Cache Key'))
+
     def __init__(self):
         self.graph = nx.DiGraph()
         self.root_node_id = None
         self.alias_map = {}  # alias: table_name
-        self.condition_keys = ['Filter', 'Join Filter', 'Hash Cond', 'Recheck Cond', 'Index Cond', 'Merge Cond',
-                               'Cache Key']
+        self.table_alias_map = {}  # table_name: {alias: None}, reverse of alias_map kept in registration order
+        self._condition_aliases_cache = {}  # condition: aliases, valid until a new alias is registered
         self.lowest_level = 0
+        self.total_cost = 0  # sum of node costs, set by parse
 
     def map_subquery_aliases_to_alternative(self, subquery_alias) -> str:
         """Map subquery alias to alternative."""
         table_name = self.alias_map[subquery_alias]
         print("table_name:", table_name)
-        for alias, name in self.alias_map.items():
-            if name == table_name and alias != subquery_alias:
+        for alias in self.table_alias_map[table_name]:
+            if alias != subquery_alias:
                 return alias
 
     def _get_single_join_pair(self, node_id: str) -> Tuple[str, str]:
-        node_data = self.graph.nodes(data=True)[node_id]
+        nodes = self.graph.nodes
+        node_data = nodes[node_id]
         condition_found = False
         if node_data['node_type'] == "Nested Loop":
             children = self.graph.successors(node_id)
             # if nested loop, get join pair from condition of child node that is not a join
             for child in children:
-                child_node_data = self.graph.nodes(data=True)[child]
+                child_node_data = nodes[child]
                 if "Join" not in child_node_data['node_type'] and child_node_data['node_type'] != "Nested Loop":
                     print("child type:", child_node_data['node_type'])
-                    for attribute in self.condition_keys:
-                        if attribute in child_node_data and attribute != "Join Filter" and attribute != 'Cache Key':
+                    for attribute in self._pairing_condition_keys:
+                        if attribute in child_node_data:
                             condition_aliases = self._extract_aliases_from_condition(child_node_data[attribute])
                             print("attribute:", attribute)
                             print("nested loop join condition:", child_node_data[attribute])
                             print("condition_aliases:", condition_aliases)
                             if len(condition_aliases) > 1:
                                 condition_found = True
-                                return tuple(self._extract_aliases_from_condition(child_node_data[attribute]))
+                                return tuple(condition_aliases)
 
             if not condition_found:
                 # if condition still not found, check its non join descendants:
-                print("current node type:", self.graph.nodes(True)[node_id]['node_type'])
-                print("current join order:", self.graph.nodes(True)[node_id]['join_order'])
+                print("current node type:", nodes[node_id]['node_type'])
+                print("current join order:", nodes[node_id]['join_order'])
                 for child in self.graph.successors(node_id):
                     # make sure child is non join before proceeding
-                    if not ("Join" in self.graph.nodes(data=True)[child]['node_type'] or self.graph.nodes(data=True)[child]['node_type'] == "Nested Loop"):
-                        print("child type:", self.graph.nodes(data=True)[child]['node_type'])
+                    if nodes[child]['node_type'] not in JOIN_NODE_TYPES:
+                        print("child type:", nodes[child]['node_type'])
                         descendants = nx.descendants(self.graph, child)
                         for descendant in descendants: # check its descendants
-                            print("descendant type:", self.graph.nodes(data=True)[descendant]['node_type'])
-                            descendant_node_data = self.graph.nodes(data=True)[descendant]
-                            for attribute in self.condition_keys: # get condition from descendants
-                                if attribute in descendant_node_data and attribute != "Join Filter" and attribute != 'Cache Key':
-                                    condition_aliases = set(self._extract_aliases_from_condition(descendant_node_data[attribute]))
+                            print("descendant type:", nodes[descendant]['node_type'])
+                            descendant_node_data = nodes[descendant]
+                            for attribute in self._pairing_condition_keys: # get condition from descendants
+                                if attribute in descendant_node_data:
+                                    condition_aliases = self._extract_aliases_from_condition(descendant_node_data[attribute])
                                     print("self.alias_map:", self.alias_map)
                                     descendant_alias = descendant_node_data['aliases']
                                     if len(descendant_alias) == 1:
@@ -80,9 +114,10 @@ class QEPParser:
         else:
             for attribute in self.condition_keys:
                 if attribute != "Join Filter" and attribute in node_data:
+                    condition_aliases = self._extract_aliases_from_condition(node_data[attribute])
                     print("non nested loop join condition:", node_data[attribute])
-                    print("aliases:", self._extract_aliases_from_condition(node_data[attribute]))
-                    return tuple(self._extract_aliases_from_condition(node_data[attribute]))
+                    print("aliases:", condition_aliases)
+                    return tuple(condition_aliases)
 
         print("still not found:", node_data['node_type'])
 
@@ -99,12 +134,11 @@ class QEPParser:
         # print("lowest level:", self.lowest_level)
         ordered_join_pairs = []
         ordered_join_pairings_d = {}  # {node_id: {'join_on': (alias, alias)}}
-        for node_level in range(self.lowest_level, -1, -1):
-            # print("processing for node_level:", node_level)
-            nodes = self._get_nodes_by_level(node_level)
-            for node_id in nodes:
-                node_data = self.graph.nodes(data=True)[node_id]
-                if "Join" in node_data['node_type'] or node_data['node_type'] == "Nested Loop":
+        nodes = self.graph.nodes
+        for level_nodes in self._get_levels_bottom_up():
+            for node_id in level_nodes:
+                node_data = nodes[node_id]
+                if node_data['node_type'] in JOIN_NODE_TYPES:
                     join_pair = self._get_single_join_pair(node_id)
                     print("join_pair is:", join_pair)
                     if join_pair:
@@ -144,19 +178,7 @@ class QEPParser:
 
     @staticmethod
     def _get_join_order_aliases(join_order_str: str):
-        join_order_str = join_order_str.replace("[", "").replace("]", "")
-        return join_order_str.split(", ")
-
-    def _format_join_order_to_string(self, join_order: List) -> str:
-        """Format a list of aliases to a string."""
-        if not isinstance(join_order, list):
-            return str(join_order)
-
-        elements = []
-        for item in join_order:
-            elements.append(self._format_join_order_to_string(item))
-
-        return f"[{', '.join(elements)}]"
+        return join_order_str.translate(_BRACKET_DELETION).split(", ")
 
     def _resolve_table_name(self, identifier: str) -> str:
         """
@@ -167,32 +189,43 @@ class QEPParser:
 
     def _register_alias(self, alias: str, table_name: str):
         """Register a table alias."""
-        self.alias_map[alias.lower()] = table_name
+        alias = alias.lower()
+        previous_table = self.alias_map.get(alias)
+        if previous_table is None:
+            # A new alias can match words the cached extractions skipped
+            self._condition_aliases_cache.clear()
+        elif previous_table != table_name:
+            del self.table_alias_map[previous_table][alias]
+        self.alias_map[alias] = table_name
+        self.table_alias_map.setdefault(table_name, {})[alias] = None
 
     def _extract_aliases_from_condition(self, condition: str) -> Set[str]:
-        """Extract all table aliases from a condition string."""
-        # Extract all words from the condition
-        condition = condition.replace("(", "")
-        condition = condition.replace(")", "")
-        words = condition.split()
+        """Extract all table aliases from a condition string. The returned set is shared and must not be mutated."""
+        cached = self._condition_aliases_cache.get(condition)
+        if cached is None:
+            cached = self._condition_aliases_cache[condition] = self._scan_condition_for_aliases(condition)
+        return cached
+
+    def _scan_condition_for_aliases(self, condition: str) -> Set[str]:
+        """Scan the words of a condition string for registered table aliases."""
+        # Extract the left side of the dot of every word from the condition in one regex pass
+        candidates = _WORD_PREFIX.findall(condition.translate(_PAREN_DELETION).lower())
         aliases = set()
 
         # Check if each word is an alias
-        for word in words:
-            print("word:", word)
-            candidate = word.split('.')[0]  # only consider the left side of the dot
+        for candidate in candidates:
+            print("word:", candidate)
             # Check if the word is a valid alias
-            if candidate.lower() in self.alias_map:
-                aliases.add(candidate.lower())
+            if candidate in self.alias_map:
+                aliases.add(candidate)
 
         return aliases
 
     def _parse_node(self, node_data: Dict, node_level: int, parent_node_id: str = None) -> str:
-        """Parse a single node in the QEP data."""
-        # Setup node data first
-        """Parse a single node and its children."""
+        """Parse a single node in the QEP data and attach it to its parent."""
 
-        node_id = str(uuid.uuid4())
+        # Interned, so the many dict/set lookups keyed by this id can match on identity first
+        node_id = sys.intern(str(uuid.uuid4()))
         tables = set()
         aliases = set()
         try:
@@ -201,9 +234,11 @@ class QEPParser:
             print(node_data)
             raise ValueError("Node Type not found in node data: \n{}".format(node_data))
 
-        # Check if node is part of subquery
+        # Check if node is part of subquery (nodes are created parent-first, so the parent's trait is already set)
         if 'Subplan Name' in node_data:
             subplan_status = True
+        elif parent_node_id is not None:
+            subplan_status = self.graph.nodes[parent_node_id]['_subplan']
         else:
             subplan_status = False
 
@@ -215,7 +250,7 @@ class QEPParser:
         if node_type in ScanType:
             if 'Alias' in node_data:
                 # wrapped in if block to handle the edge case of BitMap Index Scan not having an alias attribute
-                alias = node_data['Alias']
+                alias = sys.intern(node_data['Alias'])
                 self._register_alias(alias, node_data['Relation Name'])
                 aliases.add(alias)
 
@@ -234,6 +269,7 @@ class QEPParser:
             'aliases': aliases,
             '_node_level': node_level,
             '_subplan': subplan_status,
+            '_join_or_scan': NODE_CATEGORIES.get(node_type, "Unknown"),
         }
 
         # Get Conditions
@@ -254,13 +290,20 @@ class QEPParser:
         if parent_node_id is not None:
             self.graph.add_edge(parent_node_id, node_id)
 
-        # Recursively parse children
-        if 'Plans' in node_data:
-            for child_node_data in node_data['Plans']:
-                self._parse_node(child_node_data, node_level + 1, node_id)
-
         return node_id
 
+    def _parse_plan_tree(self, plan: Dict):
+        """Parse the plan tree in pre-order with an explicit stack instead of recursion."""
+        stack = [(plan, 0, None)]
+        while stack:
+            node_data, node_level, parent_node_id = stack.pop()
+            node_id = self._parse_node(node_data, node_level, parent_node_id)
+
+            # Push children in reverse so they are popped (and attached to the parent) in plan order
+            child_plans = node_data.get('Plans')
+            if child_plans:
+                stack.extend((child_node_data, node_level + 1, node_id) for child_node_data in reversed(child_plans))
+
     @staticmethod
     def _extract_plan(plan: List) -> Dict:
         """Extract the plan data from the nested list(s)."""
@@ -275,20 +318,21 @@ class QEPParser:
             if type(plan) == dict and 'Plan' in plan.keys():
                 return plan['Plan']
 
-    def _get_nodes_by_level(self, node_level: int) -> List:
-        return [node_id for (node_id, node_data) in self.graph.nodes(data=True) if
-                node_data['_node_level'] == node_level]
+    def _get_levels_bottom_up(self) -> List[List]:
+        """Group nodes by depth in one breadth-first pass, deepest level first."""
+        levels = list(nx.bfs_layers(self.graph, self.root_node_id))
+        levels.reverse()
+        return levels
 
     def _get_join_order(self) -> Dict:
         join_order = {}  # {node_id: {'join_order': [alias, alias, alias]}, node_id: {'join_order': [alias, alias, alias]}}
+        nodes = self.graph.nodes
         # Start from the lowest level, travel upwards breadth-first
         # print("lowest level:", self.lowest_level)
-        for node_level in range(self.lowest_level, -1, -1):
-            # print("processing for node_level:", node_level)
-            nodes = self._get_nodes_by_level(node_level)
-            for node_id in nodes:
-                node_data = self.graph.nodes(data=True)[node_id]
-                if not ("Join" in node_data['node_type'] or node_data['node_type'] == "Nested Loop"):
+        for level_nodes in self._get_levels_bottom_up():
+            for node_id in level_nodes:
+                node_data = nodes[node_id]
+                if node_data['node_type'] not in JOIN_NODE_TYPES:
                     print(f"processing {node_data['node_type']} on {node_data['aliases']}")
                     # If it's not a join node, copy the join order from the child OR initialize from aliases attribute
                     children = list(self.graph.successors(node_id))
@@ -330,7 +374,7 @@ class QEPParser:
                     current_node_order = []
                     for child in children:
                         # check if child is a subplan node, if yes ignore that as pg_hint_plan does not support subplan table aliasing
-                        if self.graph.nodes(data=True)[child]['_subplan']:
+                        if nodes[child]['_subplan']:
                             continue
                         child_join_order = join_order[child]['_join_order']
                         # if child has only one alias, unpack it
@@ -344,6 +388,9 @@ class QEPParser:
 
     def get_node_positions(self) -> Dict[str, Dict[str, str]]:
         node_positions_d = {}  # {node_id: {position: 'l'/'r'/'c'}}
+        nodes = self.graph.nodes
+        out_degree = dict(self.graph.out_degree())  # child counts from one adjacency scan
+        parent_of = {child: parent for parent, child in self.graph.edges()}  # plan trees have one parent per node
 
         for node_id, node_data in self.graph.nodes(True):
             # only care for the positions of non subquery nodes
@@ -351,9 +398,9 @@ class QEPParser:
                 # check not root
                 if not node_data.get('is_root'):
                     # check parent if node is only child
-                    parent = list(self.graph.predecessors(node_id))[0]
-                    parent_node_data = self.graph.nodes(True)[parent]
-                    if len(list(self.graph.successors(parent))) == 1: # only child
+                    parent = parent_of[node_id]
+                    parent_node_data = nodes[parent]
+                    if out_degree[parent] == 1: # only child
                         # therefore put 'c' for center
                         node_positions_d[node_id] = {'position': 'c'}
                     else: # not only child
@@ -377,28 +424,14 @@ class QEPParser:
 
     def get_total_cost(self) -> float:
         """
-        Calculate the total cost by summing the 'cost' attribute of all nodes in the graph.
+        Return the total cost of the last parsed plan, i.e. the sum of the 'cost' attribute of all nodes.
 
-        Parameters:
-        G (networkx.Graph): A NetworkX graph where nodes have a 'cost' attribute
+        The sum is accumulated by parse in its final pass over the nodes, so no extra walk is needed here.
 
         Returns:
         float: The total cost sum across all nodes
-
-        Raises:
-        KeyError: If any node is missing the 'cost' attribute
         """
-        total_cost = 0
-
-        # Iterate through all nodes and sum their costs
-        for node in self.graph.nodes():
-            try:
-                node_cost = self.graph.nodes[node]['cost']
-                total_cost += node_cost
-            except KeyError:
-                raise KeyError(f"Node {node} is missing the 'cost' attribute")
-
-        return total_cost
+        return self.total_cost
 
     @staticmethod
     def _flatten_list(nested_list: List) -> List:
@@ -416,8 +449,9 @@ class QEPParser:
 
     def _get_join_node_aliases(self, join_nodes: List[Tuple[Tuple, str]]) -> Dict:
         join_aliases_d = {} # {node_id: {'join_aliases': [alias, alias]}}
+        nodes = self.graph.nodes
         for join_pair, join_node_id in join_nodes:
-            node_data = self.graph.nodes(data=True)[join_node_id]
+            node_data = nodes[join_node_id]
             join_aliases = node_data['_join_table_aliases']
             join_aliases_d[join_node_id] = {'aliases': join_aliases}
 
@@ -449,6 +483,7 @@ class QEPParser:
 
     def _get_swappability(self) -> Dict[str, Dict[str, bool]]:
         swappablity_d = {}
+        nodes = self.graph.nodes
         for node_id, node_data in self.graph.nodes(True):
             # Check if it is a subquery node:
             if node_data['_subplan']:
@@ -456,7 +491,7 @@ class QEPParser:
                 swappablity_d[node_id] = {'_swappable': False}
             else:
                 # Check if its join node:
-                if "Join" in node_data['node_type'] or node_data['node_type'] == "Nested Loop":
+                if node_data['node_type'] in JOIN_NODE_TYPES:
                     swappablity_d[node_id] = {'_swappable': True}
                 else: # if not join node
                     # Check if parent is join
@@ -466,8 +501,8 @@ class QEPParser:
                     print("pred:", pred)
                     if pred:
                         parent = pred[0]
-                        parent_node_data = self.graph.nodes(True)[parent]
-                        if "Join" in parent_node_data['node_type'] or parent_node_data['node_type'] == "Nested Loop":
+                        parent_node_data = nodes[parent]
+                        if parent_node_data['node_type'] in JOIN_NODE_TYPES:
                             swappablity_d[node_id] = {'_swappable': True}
                         else:
                             swappablity_d[node_id] = {'_swappable': False}
@@ -483,20 +518,7 @@ class QEPParser:
         plan = self._extract_plan(qep_data)
 
         # Parse the root node, the parse_node function will recursively be called
-        self._parse_node(plan, node_level=0, parent_node_id=None)
-
-        # Inherit Subplan trait
-        for node_id, data in self.graph.nodes(data=True):
-            if data['_subplan']:
-                for child in descendants(self.graph, node_id):
-                    nx.set_node_attributes(self.graph, {child: {'_subplan': True}})
-
-        # Resolve table names for aliases used:
-        for node_id, data in self.graph.nodes(data=True):
-            if data['node_type'] in ScanType:
-                print(data)
-                table_names = [self._resolve_table_name(alias) for alias in data['aliases']]
-                nx.set_node_attributes(self.graph, {node_id: {'tables': set(table_names)}})
+        self._parse_plan_tree(plan)
 
         # Get Join Order
         join_order_dict = self._get_join_order()
@@ -504,25 +526,20 @@ class QEPParser:
         # Set join order as node attribute
         nx.set_node_attributes(self.graph, join_order_dict)
 
-        # Get Join Order String
-        join_order_str_dict = {}
-        for node_id in join_order_dict:
-            join_order = join_order_dict[node_id]['_join_order']
+        # Get join order string and the join table aliases derived from it in one pass over the join orders
+        join_order_attrs = {}
+        for node_id, join_order_d in join_order_dict.items():
+            join_order = join_order_d['_join_order']
             if type(join_order) == list and len(join_order) > 1:
-                print("debug join order str:", join_order_dict[node_id]['_join_order'])
-                join_order_str_dict[node_id] = {'join_order': self._format_join_order_to_string(join_order)}
+                print("debug join order str:", join_order)
+                join_order_str = format_join_order_to_string(join_order)
+                aliases = self._get_join_order_aliases(join_order_str)
+                # Space separated form is what join hints emit, so build it once here
+                join_order_attrs[node_id] = {'join_order': join_order_str, '_join_table_aliases': aliases,
+                                             '_join_aliases_str': " ".join(aliases)}
 
-        # Set join order string as graph attribute
-        nx.set_node_attributes(self.graph, join_order_str_dict)
-
-        # Get join table aliases
-        join_table_aliases = {}
-        for node_id in join_order_str_dict:
-            join_order_str = join_order_str_dict[node_id]['join_order']
-            join_table_aliases[node_id] = {'_join_table_aliases': self._get_join_order_aliases(join_order_str)}
-
-        # Set join table aliases as node attribute
-        nx.set_node_attributes(self.graph, join_table_aliases)
+        # Set join order string and join table aliases as node attributes
+        nx.set_node_attributes(self.graph, join_order_attrs)
 
         # Ordered Join
         ordered_join_pairs, join_relation_aliases = self._get_join_pairings_in_order()
@@ -585,6 +602,24 @@ class QEPParser:
                     for alias in node_data['aliases']:
                         scan_node_id_map[alias] = node_id
 
+        # Single pass over the final nodes: resolve scan table names and freeze each node's aliases so
+        # matching code can run set tests without rebuilding sets, and sum the plan's total cost
+        total_cost = 0
+        for node_id, node_data in self.graph.nodes(data=True):
+            try:
+                total_cost += node_data['cost']
+            except KeyError:
+                raise KeyError(f"Node {node_id} is missing the 'cost' attribute")
+            if node_data['node_type'] in ScanType:
+                node_data['tables'] = {self._resolve_table_name(alias) for alias in node_data['aliases']}
+            node_data['_alias_set'] = frozenset(node_data['aliases'])
+            node_data['_aliases_sorted'] = tuple(sorted(node_data['_alias_set']))
+            node_data['_tables_sorted'] = tuple(sorted(node_data['tables']))
+            if node_data['is_root']:
+                # Record the (possibly relabelled) root so consumers do not need to scan for it
+                self.graph.graph['root'] = node_id
+        self.total_cost = total_cost
+
         swap_d = self._get_swappability()
 
         # set swappability as node attribute
@@ -27,47 +27,30 @@ class QEPVisualizer:
         """
         pos = {}
 
-        def _get_tree_size(node, seen=None):
-            """Calculate the number of leaf nodes in the subtree."""
-            if seen is None:
-                seen = set()
-            if node in seen:
-                return 0
-            seen.add(node)
-            children = list(self.graph.neighbors(node))
-            if not children:
-                return 1
-            return sum(_get_tree_size(child, seen) for child in children)
-
-        def _assign_positions(node, x=0, level=0, seen=None):
-            """Assign x positions to all nodes."""
-            if seen is None:
-                seen = set()
-            if node in seen:
-                return x
-            seen.add(node)
-
-            children = list(self.graph.neighbors(node))
-            start_x = x
-
-            # Process children
-            for child in children:
-                if child not in seen:
-                    x = _assign_positions(child, x, level + 1, seen)
-
-            # Position current node
-            if children:
-                # Center parent above children
+        # Assign x positions to all nodes with an explicit post-order walk: leaves are placed left to right,
+        # and each parent is centered above its children once they all have positions
+        x = 0
+        seen = {root}
+        stack = [(root, 0, None)]
+        while stack:
+            node, level, children = stack.pop()
+            if children is not None:
+                # Children already positioned, center parent above them
                 children_x = [pos[child][0] for child in children]
                 pos[node] = (sum(children_x) / len(children), -level)
-            else:
+                continue
+
+            children = list(self.graph.neighbors(node))
+            if not children:
                 pos[node] = (x, -level)
                 x += width
+                continue
 
-            return x
-
-        # Assign initial positions
-        _assign_positions(root)
+            stack.append((node, level, children))
+            for child in reversed(children):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append((child, level + 1, None))
 
         # Center the layout
         if pos:
@@ -127,30 +110,21 @@ class QEPVisualizer:
         plt.figure(figsize=(20, 15))
 
         # Find root node (node with is_root=True)
-        root = [n for n, d in self.graph.nodes(data=True) if d.get('is_root', False)][0]
+        root = self.graph.graph.get('root')
+        if root is None:
+            root = next(n for n, d in self.graph.nodes(data=True) if d.get('is_root', False))
 
         # Calculate positions with increased spacing
         pos = self._calculate_layout(root, width=1.5)
 
-        # Draw nodes with different colors for root vs non-root
-        root_nodes = [n for n, d in self.graph.nodes(data=True) if d.get('is_root', False)]
-        non_root_nodes = [n for n, d in self.graph.nodes(data=True) if not d.get('is_root', False)]
-
         # Increase node size to accommodate more text
         node_size = 5000
 
-        # Draw root node in a different color
-        nx.draw_networkx_nodes(self.graph, pos,
-                               nodelist=root_nodes,
-                               node_size=node_size,
-                               node_color='lightcoral',
-                               node_shape='s')
-
-        # Draw other nodes
+        # Draw all nodes in one collection, coloring the root differently
+        node_colors = ['lightcoral' if node == root else 'lightblue' for node in self.graph.nodes]
         nx.draw_networkx_nodes(self.graph, pos,
-                               nodelist=non_root_nodes,
                                node_size=node_size,
-                               node_color='lightblue',
+                               node_color=node_colors,
                                node_shape='s')
 
         # Draw edges
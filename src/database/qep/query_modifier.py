@@ -12,7 +12,7 @@ class QueryModifier:
         self.hint = hint
 
     def modify(self):
-        return self.hint + "\n" + self.query
+        return "\n".join((self.hint, self.query))
 
 
 if __name__ == "__main__":
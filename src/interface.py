@@ -1,18 +1,43 @@
+import os
+import signal
 import subprocess
 
 from src.settings.filepaths import SRC_DIR, ROOT_DIR
 
 
-def run_interface():
-    # Use the subcommand to run the GUI:
-
+def start_interface() -> subprocess.Popen:
+    """Start the GUI dev server (npm run dev) in its own process group, so stop_interface can end all of it"""
     folder_name = "sql-visualizer"
-    command = f"cd {str(ROOT_DIR / folder_name)} && npm run dev"
+    if os.name == 'nt':
+        return subprocess.Popen("npm run dev", shell=True, cwd=str(ROOT_DIR / folder_name),
+                                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    return subprocess.Popen("npm run dev", shell=True, cwd=str(ROOT_DIR / folder_name), start_new_session=True)
+
 
-    subprocess.run(command, shell=True)
+def stop_interface(process: subprocess.Popen):
+    """Stop the GUI together with the npm/next processes it started, which would otherwise keep port 3000 bound"""
+    if process.poll() is not None:
+        return
+    if os.name == 'nt':
+        subprocess.run(f"taskkill /F /T /PID {process.pid}", shell=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)  # the shell started the session, so its pid is the group id
+        except ProcessLookupError:
+            return
+    process.wait()
+
+
+def run_interface():
+    # Use the subcommand to run the GUI:
+    process = start_interface()
+    try:
+        process.wait()
+    finally:
+        stop_interface(process)
 
 
 if __name__ == "__main__":
     print(SRC_DIR)
     print(ROOT_DIR)
-    run_interface()
\ No newline at end of file
+    run_interface()
@@ -1,16 +1,28 @@
-from multiprocessing import Process
+import os
+import sys
+import threading
+import uuid
+from collections import OrderedDict
 
-from flask import Flask, jsonify, request
+import orjson
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from typing import Dict, List, Optional, Set, Tuple, Union
-from dataclasses import dataclass
-from src.database.databaseManager import DatabaseManager
-from src.interface import run_interface
+from dataclasses import dataclass, field
+from src.database.databaseManager import DB_POOL_MAX_CONNECTIONS, DatabaseManager
+from src.interface import start_interface, stop_interface
 
-from src.utils.JSONEncoder import SetEncoder
+from src.utils.JSONEncoder import ORJSONProvider
 from src.whatif import QueryPlanManager
 
 
+# Header carrying the session id issued by /api/database/select, so each session keeps its own database and plan
+# state. A header rather than a cookie, as the frontend and the API are different sites (localhost vs 127.0.0.1)
+SESSION_HEADER = "X-Session-Id"
+# Sessions kept at once; beyond this the least recently used one is dropped and its client must select a database again
+MAX_SESSIONS = 256
+
+
 @dataclass
 class DatabaseConfig:
     """Configuration for available databases"""
@@ -18,21 +30,43 @@ class DatabaseConfig:
     value: str
 
 
+# Databases offered to the frontend, and the static payload listing them (built once instead of per request)
+AVAILABLE_DATABASES = (
+    DatabaseConfig("TPC-H", "TPC-H"),
+    DatabaseConfig("mysql", "MySQL"),
+    DatabaseConfig("oracle", "Oracle"),
+    DatabaseConfig("sqlserver", "SQL Server")
+)
+VALID_DBS = frozenset(db.name for db in AVAILABLE_DATABASES)
+_AVAILABLE_DATABASES_BODY = orjson.dumps(
+    {"databases": [{"value": db.name, "label": db.value} for db in AVAILABLE_DATABASES]},
+    option=orjson.OPT_SORT_KEYS
+)
+
+
+@dataclass
+class Session:
+    """Database connection and query plan state of one client"""
+    db_connection: DatabaseManager
+    query_plan_manager: QueryPlanManager = field(default_factory=QueryPlanManager)
+
+
 class DatabaseServer:
     """Main server class handling database operations and API endpoints"""
 
     def __init__(self):
         self.app = Flask(__name__)
-        self.app.json = SetEncoder(self.app)
+        self.app.json = ORJSONProvider(self.app)
         CORS(self.app, resources={
             r"/api/*": {
                 "origins": ["http://localhost:3000", "http://localhost:3001"],  # Your NextJS development server
                 "methods": ["GET", "POST", "OPTIONS"],
-                "allow_headers": ["Content-Type"]
+                "allow_headers": ["Content-Type", SESSION_HEADER]
             }
         })
-        self.db_connection: Optional[DatabaseManager] = None
-        self.query_plan_manager = QueryPlanManager()
+        # Sessions by server-issued id, least recently used first
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._session_lock = threading.Lock()
         self._register_routes()
 
     def _register_routes(self):
@@ -43,6 +77,25 @@ class DatabaseServer:
         self.app.route('/api/query/modify', methods=['POST'])(self.modify_query)
         self.app.route('/api/preview_join_swaps', methods=['POST'])(self.preview_join_swaps)
 
+    def _get_session(self) -> Optional[Session]:
+        """Get the session of the request, None if its id was not issued by this server or has been dropped"""
+        session_id = request.headers.get(SESSION_HEADER)
+        if not session_id:
+            return None
+        with self._session_lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def _put_session(self, session_id: str, session: Session):
+        """Store a session, dropping the least recently used ones beyond MAX_SESSIONS"""
+        with self._session_lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+
     def preview_join_swaps(self):
         """Preview join swaps based on modifications"""
         if not request.is_json:
@@ -51,8 +104,12 @@ class DatabaseServer:
         data = request.get_json()
         modifications = data.get('modifications', [])
 
+        session = self._get_session()
+        if session is None:
+            return jsonify({"status": "DatabaseError", "message": "Invalid request, database connection not found."}), 400
+
         try:
-            modified_graph_json = self.query_plan_manager.preview_swap(modifications)
+            modified_graph_json = session.query_plan_manager.preview_swap(modifications)
             return jsonify({
                 "status": "success",
                 "message": "Preview join swaps successful",
@@ -63,8 +120,12 @@ class DatabaseServer:
 
     def get_avail_join_swaps(self):
         """Get available join swaps for the current query plan"""
+        session = self._get_session()
+        if session is None:
+            return jsonify({"status": "DatabaseError", "message": "Invalid request, database connection not found."}), 400
+
         try:
-            avail_joins = self.query_plan_manager.get_avail_join_swaps()
+            avail_joins = session.query_plan_manager.get_avail_join_swaps()
             return jsonify({
                 "status": "success",
                 "message": "Available join swaps retrieved successfully",
@@ -76,13 +137,7 @@ class DatabaseServer:
     @staticmethod
     def get_available_databases():
         """Get list of available databases"""
-        databases = [
-            DatabaseConfig("TPC-H", "TPC-H"),
-            DatabaseConfig("mysql", "MySQL"),
-            DatabaseConfig("oracle", "Oracle"),
-            DatabaseConfig("sqlserver", "SQL Server")
-        ]
-        return jsonify({"databases": [{"value": db.name, "label": db.value} for db in databases]}), 200
+        return Response(_AVAILABLE_DATABASES_BODY, mimetype='application/json'), 200
 
     def select_database(self):
         """Select and connect to a database"""
@@ -92,17 +147,21 @@ class DatabaseServer:
         data = request.get_json()
         selected_db = data.get('database')
 
-        if not selected_db or selected_db not in ["TPC-H", "mysql", "oracle", "sqlserver"]:
+        if not selected_db or selected_db not in VALID_DBS:
             return jsonify({"status": "error", "message": "Invalid database selection"}), 400
 
         try:
-            self.db_connection = DatabaseManager(selected_db)
+            db_connection = DatabaseManager(selected_db)
             # Test connection
-            self.db_connection.get_qep("select * from customer C, orders O where C.c_custkey = O.o_custkey")
+            db_connection.get_qep("select * from customer C, orders O where C.c_custkey = O.o_custkey")
+            # Selecting a database starts a fresh session, so plans of the previous database are not reused
+            session_id = uuid.uuid4().hex
+            self._put_session(session_id, Session(db_connection))
             return jsonify({
                 "status": "success",
                 "message": f"Connected to {selected_db}",
-                "selectedDatabase": selected_db
+                "selectedDatabase": selected_db,
+                "sessionId": session_id
             }), 200
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 500
@@ -115,14 +174,15 @@ class DatabaseServer:
         data = request.get_json()
         query = data.get('query')
 
-        if not query or not self.db_connection:
+        session = self._get_session()
+        if not query or session is None:
             if not query:
                 return jsonify({"status": "QueryError", "message": "Invalid request, query is empty or not found."}), 400
             else:
                 return jsonify({"status": "DatabaseError", "message": "Invalid request, database connection not found."}), 400
 
         try:
-            result = self.query_plan_manager.generate_plan(query, self.db_connection)
+            result = session.query_plan_manager.generate_plan(query, session.db_connection)
             return jsonify({
                 "status": "success",
                 "message": "Query plan generated successfully",
@@ -141,10 +201,11 @@ class DatabaseServer:
         query = data.get('query')
         modifications = data.get('modifications', [])
 
-        if not query or not self.db_connection:
+        session = self._get_session()
+        if not query or session is None:
             return jsonify({"status": "error", "message": "Invalid request"}), 400
         #try:
-        result = self.query_plan_manager.modify_plan(query, modifications, self.db_connection)
+        result = session.query_plan_manager.modify_plan(query, modifications, session.db_connection)
         return jsonify({
             "status": "success",
             "message": "QEP modifications applied successfully",
@@ -162,9 +223,50 @@ class DatabaseServer:
         """Run the Flask server"""
         self.app.run(debug=debug, port=port)
 
+    def run_prod(self, port: int = 5000, threads: Optional[int] = None):
+        """Run the Flask app under gunicorn's threaded worker (Linux/macOS only)"""
+        from gunicorn.app.base import BaseApplication
+
+        app = self.app
+        options = {
+            'bind': f'127.0.0.1:{port}',
+            # Session state lives in this process, so scale with threads rather than worker processes
+            'workers': 1,
+            'worker_class': 'gthread',
+            # Never more threads than pooled database connections, so concurrent EXPLAINs do not wait on the pool
+            'threads': min(threads or (os.cpu_count() or 1) * 4, DB_POOL_MAX_CONNECTIONS),
+            'keepalive': 5,
+            'timeout': 120,
+        }
+
+        class StandaloneApplication(BaseApplication):
+            def load_config(self):
+                for key, value in options.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return app
+
+        StandaloneApplication().run()
+
+
+def create_app() -> Flask:
+    """Build the Flask app for a WSGI server, e.g. gunicorn -c gunicorn.conf.py"""
+    return DatabaseServer().app
+
 
 if __name__ == '__main__':
-    p1 = Process(target=run_interface)
-    p1.start()
-    server = DatabaseServer()
-    server.run(debug=True, port=5000)
+    # The debug reloader re-runs this block in its child (WERKZEUG_RUN_MAIN set); only launch the interface once
+    interface = None
+    if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        interface = start_interface()
+    try:
+        server = DatabaseServer()
+        if '--prod' in sys.argv:
+            server.run_prod(port=5000)
+        else:
+            server.run(debug=True, port=5000)
+    finally:
+        # Stop the whole npm/next process group, so the frontend does not keep port 3000 after the server exits
+        if interface is not None:
+            stop_interface(interface)
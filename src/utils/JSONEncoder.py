@@ -1,9 +1,40 @@
 import json
-from flask.json.provider import DefaultJSONProvider
+
+import orjson
+from flask import Response
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+
+_SET_TYPES = (set, frozenset)
 
 
 class SetEncoder(DefaultJSONProvider):
     def default(self, obj):
-        if isinstance(obj, set):
+        if isinstance(obj, _SET_TYPES):
             return list(obj)
-        return json.JSONEncoder.default(self, obj)
\ No newline at end of file
+        return json.JSONEncoder.default(self, obj)
+
+
+def _orjson_default(obj):
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, _SET_TYPES):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, serializing sets as lists like SetEncoder."""
+    # Sorted keys keep responses identical to Flask's default provider
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_orjson_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        """Build the jsonify response from orjson's bytes directly, skipping the decode/re-encode of dumps."""
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_orjson_default, option=self.option)
+        return self._app.response_class(body, mimetype="application/json")
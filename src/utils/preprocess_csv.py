@@ -1,27 +1,57 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from src.settings.filepaths import CSV_DIR
 
+CHUNK_SIZE = 1 << 20  # bytes read per pass when rewriting a file
+
+
+def _strip_line_end_pipes(data: bytes) -> bytes:
+    """Drop the trailing '|' of every complete line in data."""
+    return data.replace(b'|\r\n', b'\r\n').replace(b'|\n', b'\n')
+
+
 def remove_pipe_from_file(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-
-    with open(file_path, 'w') as file:
-        for line in lines:
-            if line.endswith('|\n'):
-                line = line[:-2] + '\n'
-            elif line.endswith('|'):
-                line = line[:-1]
-            file.write(line)
-
-
-def process_csv_folder(folder_path):
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(folder_path, filename)
-            remove_pipe_from_file(file_path)
+    # Stream the file in binary chunks into a temp file instead of holding all of its lines in memory,
+    # then swap the temp file in place of the original
+    tmp_path = file_path + '.tmp'
+    try:
+        with open(file_path, 'rb') as fin, open(tmp_path, 'wb') as fout:
+            pending = []  # pieces of the line still being read, joined once it ends instead of on every chunk
+            while chunk := fin.read(CHUNK_SIZE):
+                # Only rewrite up to the last newline; a line split across chunks is finished with a later one
+                newline_at = chunk.rfind(b'\n')
+                if newline_at < 0:
+                    pending.append(chunk)
+                    continue
+                pending.append(chunk[:newline_at + 1])
+                fout.write(_strip_line_end_pipes(b''.join(pending)))
+                pending = [chunk[newline_at + 1:]]
+            # Last line has no newline
+            tail = b''.join(pending)
+            if tail.endswith(b'|'):
+                tail = tail[:-1]
+            fout.write(tail)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        # Don't leave a partial temp file next to the untouched original
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def process_csv_folder(folder_path, max_workers=None):
+    filenames = [filename for filename in os.listdir(folder_path) if filename.endswith('.csv')]
+    # Rewriting is disk bound, so overlap the files on threads to keep several reads/writes in flight
+    if max_workers is None:
+        max_workers = (os.cpu_count() or 1) * 2
+    paths = [os.path.join(folder_path, filename) for filename in filenames]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for filename, _ in zip(filenames, executor.map(remove_pipe_from_file, paths)):
             print(f"Processed: {filename}")
 
 
 if __name__ == "__main__":
     process_csv_folder(CSV_DIR)
-    print("All CSV files in the folder have been processed.")
\ No newline at end of file
+    print("All CSV files in the folder have been processed.")
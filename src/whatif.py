@@ -1,16 +1,34 @@
+import functools
+import json
+import logging
+import threading
+from collections import OrderedDict
 from typing import Optional, List, Set, Dict, Union, Tuple
 
 import networkx as nx
 
 from src.database.databaseManager import DatabaseManager
 from src.database.qep.qep_change_checker import QEPChangeChecker
-from src.database.qep.qep_parser import QEPParser
+from src.database.qep.qep_parser import QEPParser, JOIN_NODE_TYPES
 from src.database.qep.qep_modifier import QEPModifier
 from src.database.query_modifier import QueryModifier
-from src.custom_types.qep_types import TypeModification, InterJoinOrderModification, IntraJoinOrderModification, \
-    JoinType
+from src.custom_types.qep_types import TypeModification, InterJoinOrderModification, IntraJoinOrderModification
 from src.database.hint_generator import HintConstructor
 
+logger = logging.getLogger(__name__)
+
+# Number of previews kept per plan; the UI toggles between a handful of modification lists
+PREVIEW_CACHE_SIZE = 64
+
+
+def _synchronized(method):
+    """Run a QueryPlanManager method while holding the manager's lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class QueryPlanManager:
     """Manages query plan operations and modifications"""
@@ -24,38 +42,33 @@ class QueryPlanManager:
         self.join_node_id_map: Optional[Dict[str, str]] = None
         self.query_checker = QEPChangeChecker()
         self.scan_node_id_map = None
+        self.original_cost: Optional[float] = None
+        self._preview_cache: OrderedDict[str, Dict] = OrderedDict()  # modifications key: modified graph entry, oldest first
+        # The server handles requests on several threads; the plan, parser and preview cache are changed together,
+        # so the public methods run one at a time per manager
+        self._lock = threading.RLock()
 
+    @_synchronized
     def generate_plan(self, query: str, db_connection: DatabaseManager) -> Dict:
         """Generate query execution plan"""
         qep_data = db_connection.get_qep(query)
         self.original_graph, self.ordered_relation_pairs, self.alias_map, self.join_node_id_map, self.scan_node_id_map = self.parser.parse(qep_data, self.join_node_id_map, self.scan_node_id_map)
+        self.original_cost = self.parser.get_total_cost()
+        self._preview_cache.clear()  # previews belong to the plan they were built from
 
         return self._convert_graph_to_dict(self.original_graph)
 
     @staticmethod
     def _is_join(node_type: str):
-        if node_type in JoinType and node_type != "Hash":
-            return True
-        else:
-            return False
+        return node_type in JOIN_NODE_TYPES
 
     def _determine_join_order_change_type(self, mod: Dict) -> Union[IntraJoinOrderModification, InterJoinOrderModification]:
         node_1_id = mod['node_1_id']
         node_2_id = mod['node_2_id']
 
-        print(self.original_graph.nodes(True))
-
-        node_1_data = None
-        node_2_data = None
-
-        for node_id, node_data in self.original_graph.nodes(True):
-            if node_id == node_1_id:
-                node_1_data = node_data
-            if node_id == node_2_id:
-                node_2_data = node_data
-
-        node_1_type = node_1_data['node_type']
-        node_2_type = node_2_data['node_type']
+        nodes = self.original_graph.nodes
+        node_1_type = nodes[node_1_id]['node_type']
+        node_2_type = nodes[node_2_id]['node_type']
 
         if self._is_join(node_1_type) and self._is_join(node_2_type): # if both is Join type
             # then is InterJoinChange
@@ -63,72 +76,75 @@ class QueryPlanManager:
                 join_node_1_id=node_1_id,
                 join_node_2_id=node_2_id
             )
-            print("gotten inter join query mod:", query_mod)
+            logger.debug("gotten inter join query mod: %s", query_mod)
         else: # if either one is not join type, then is IntraJoinChange
             # get parent of either will do
-            parent = list(self.original_graph.predecessors(node_1_id))[0]
+            parent = next(self.original_graph.predecessors(node_1_id))
             query_mod =IntraJoinOrderModification(
                 join_node_id=parent
             )
-            print("gotten intra join query mod:", query_mod)
+            logger.debug("gotten intra join query mod: %s", query_mod)
 
         return query_mod
 
 
+    def _make_modification(self, mod: Dict):
+        modification_type = mod.get('mod_type')
+        if modification_type == 'TypeChange':
+            query_mod = TypeModification(
+                node_type=mod.get('node_type'),
+                original_type=mod.get('original_type'),
+                new_type=mod.get('newType'),
+                tables=frozenset(mod.get('tables', ())),
+                node_id=mod.get('node_id', '')
+            )
+        elif modification_type == "JoinOrderChange":
+            query_mod = self._determine_join_order_change_type(mod)
+            logger.debug("Join Order Change Modification: %s", query_mod)
+        else:
+            raise ValueError(f"Invalid modification type: {modification_type}")
+        return query_mod
+
     def _modify_graph(self, modifications: List[Dict]) -> Tuple[nx.DiGraph, List]:
         if not self.original_graph:
             raise ValueError("No original graph available")
 
         qep_modifier = QEPModifier(self.original_graph, self.ordered_relation_pairs, self.alias_map)
-        modification_lst = []
-        # Process modifications
-        for mod in modifications:
-            modification_type = mod.get('mod_type')
-            if modification_type == 'TypeChange':
-                query_mod = TypeModification(
-                    node_type=mod.get('node_type'),
-                    original_type=mod.get('original_type'),
-                    new_type=mod.get('newType'),
-                    tables=set(mod.get('tables', [])),
-                    node_id=mod.get('node_id', '')
-                )
-                qep_modifier.add_modification(query_mod)
-                modification_lst.append(query_mod)
-            elif modification_type == "JoinOrderChange":
-                query_mod = self._determine_join_order_change_type(mod)
-                modification_lst.append(query_mod)
-                qep_modifier.add_modification(query_mod)
-                print("Join Order Change Modification:", query_mod)
-            else:
-                raise ValueError(f"Invalid modification type: {modification_type}")
-
-        print("modifications:", modification_lst)
+        # Build every modification first, then hand them to the modifier in one batch (order is kept)
+        modification_lst = [self._make_modification(mod) for mod in modifications]
+        qep_modifier.add_modifications(modification_lst)
+
+        logger.debug("modifications: %s", modification_lst)
 
         modified_graph, mods_lst = qep_modifier.apply_modifications()
 
         return modified_graph, modification_lst
 
 
+    @_synchronized
     def modify_plan(self, query: str, modifications: List[Dict], db_connection: DatabaseManager) -> Dict:
         """Apply modifications to query plan"""
 
-        original_cost = self.parser.get_total_cost()
+        original_cost = self.original_cost
 
-        print("IN MODIFY PLAN")
-        print("modifications:", modifications)
+        logger.debug("IN MODIFY PLAN, modifications: %s", modifications)
 
-        modified_graph, mods_lst = self._modify_graph(modifications)
+        # Reuses the graph built when these modifications were previewed
+        modified = self._get_modified(modifications)
+        modified_graph, mods_lst = modified['graph'], modified['mods']
 
         # Generate hints
         hints, hint_list, hint_expl = HintConstructor(modified_graph, self.alias_map).generate_hints()
         modified_query = QueryModifier(query=query, hint=hints).modify()
-        print("self.scan_node_id_map:", self.scan_node_id_map)
+        logger.debug("self.scan_node_id_map: %s", self.scan_node_id_map)
 
         # Get updated plan
         updated_qep = db_connection.get_qep(modified_query)
-        updated_graph, updated_ordered_relation_pairs, updated_alias_map, updated_join_node_id_map, updated_scan_node_id_map = self.parser.parse(updated_qep, self.join_node_id_map, self.scan_node_id_map)
+        # Parse with a separate parser so the original plan's graph (owned by self.parser) is left intact
+        modified_parser = QEPParser()
+        updated_graph, updated_ordered_relation_pairs, updated_alias_map, updated_join_node_id_map, updated_scan_node_id_map = modified_parser.parse(updated_qep, self.join_node_id_map, self.scan_node_id_map)
 
-        modified_cost = self.parser.get_total_cost()
+        modified_cost = modified_parser.get_total_cost()
 
         changes_lst = self.query_checker.check(updated_graph, modified_graph, mods_lst)
 
@@ -143,38 +159,57 @@ class QueryPlanManager:
             "changes_lst": changes_lst
         }
 
-    def preview_swap(self, mod_lst: List) -> Dict:
-        """Preview the swap of two join nodes"""
-        modified_graph, mods_lst = self._modify_graph(mod_lst)
+    def _get_modified(self, modifications: List[Dict]) -> Dict:
+        """Modified graph, modification objects and (once previewed) graph dict for a modification list"""
+        # The UI re-sends the same modifications on re-render and then applies what it previewed;
+        # modifying the same plan is deterministic, so each distinct list is only applied once per plan
+        modified_key = json.dumps(modifications, sort_keys=True, default=str)
+        modified = self._preview_cache.get(modified_key)
+        if modified is not None:
+            self._preview_cache.move_to_end(modified_key)
+            return modified
 
-        modified_graph_json = self._convert_graph_to_dict(modified_graph)
+        modified_graph, mods_lst = self._modify_graph(modifications)
+        modified = {'graph': modified_graph, 'mods': mods_lst, 'graph_json': None}
 
-        print("modified_graph_json:", modified_graph_json)
+        self._preview_cache[modified_key] = modified
+        if len(self._preview_cache) > PREVIEW_CACHE_SIZE:
+            self._preview_cache.popitem(last=False)
+        return modified
 
-        return modified_graph_json
+    @_synchronized
+    def preview_swap(self, mod_lst: List) -> Dict:
+        """Preview the swap of two join nodes"""
+        modified = self._get_modified(mod_lst)
+        if modified['graph_json'] is None:
+            modified['graph_json'] = self._convert_graph_to_dict(modified['graph'])
+            logger.debug("modified_graph_json: %s", modified['graph_json'])
+        return modified['graph_json']
 
     @staticmethod
     def _convert_graph_to_dict(graph: nx.DiGraph) -> Dict:
         """Convert NetworkX graph to dictionary format"""
         nodes = []
+        succ = graph._succ  # raw adjacency dict: a node is a leaf when its successor dict is empty
         for node_id, data in graph.nodes(data=True):
-            node_type = data.get('node_type', '')
-            type_name = "Join" if ("Join" in node_type or "Nest" in node_type) else \
-                "Scan" if "Scan" in node_type else "Unknown"
-
+            # Attribute keys are never empty, so a first-character test replaces the startswith method call
             data_dict = {
-                k: v for k, v in data.items() if not k.startswith('_')
+                k: v for k, v in data.items() if k[0] != '_'
             }
+            # Send tables in a stable order, using the list sorted once at parse time
+            if '_tables_sorted' in data:
+                data_dict['tables'] = list(data['_tables_sorted'])
 
-            data_dict["_join_or_scan"] = type_name
-            data_dict["_isLeaf"] = len(list(graph.neighbors(node_id))) == 0
+            data_dict["_join_or_scan"] = data.get('_join_or_scan', "Unknown")  # classified once at parse time
+            data_dict["_isLeaf"] = not succ[node_id]
             data_dict["_id"] = node_id
             data_dict["_is_subquery_node"] = data.get('_subplan', False)
             data_dict["_swappable"] = data.get('_swappable', False)
 
             nodes.append(data_dict)
 
-        edges = [{"source": u, "target": v} for u, v in graph.edges()]
+        # Same order as graph.edges(), read straight from the adjacency dict already bound above
+        edges = [{"source": u, "target": v} for u, nbrs in succ.items() for v in nbrs]
 
         return {
             "nodes": nodes,
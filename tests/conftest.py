@@ -0,0 +1,31 @@
+import ast
+
+import pytest
+
+from src.settings.filepaths import SRC_DIR
+
+# EXPLAIN (FORMAT JSON) result of the example TPC-H query, as returned by psycopg2 (a Python literal, not JSON)
+EG_QEP_PATH = SRC_DIR / "database" / "qep" / "eg_qep.json"
+
+
+class FixtureDatabase:
+    """Stands in for DatabaseManager, answering every EXPLAIN with the example plan"""
+
+    def __init__(self, qep_data):
+        self.qep_data = qep_data
+        self.explained = []
+
+    def get_qep(self, query):
+        self.explained.append(query)
+        return self.qep_data
+
+
+@pytest.fixture
+def qep_data():
+    with open(EG_QEP_PATH, "r") as f:
+        return ast.literal_eval(f.read())
+
+
+@pytest.fixture
+def db(qep_data):
+    return FixtureDatabase(qep_data)
@@ -0,0 +1,32 @@
+from src.database.hint_generator import HintConstructor
+from src.database.qep.qep_parser import QEPParser
+
+
+def _hints(qep_data):
+    graph, _, alias_map, _, _ = QEPParser().parse(qep_data, None, None)
+    return HintConstructor(graph, alias_map).generate_hints()
+
+
+def test_generate_hints(qep_data):
+    hint_str, hints, hint_explanations = _hints(qep_data)
+
+    assert hints == ['LEADING((((l s) o) c))', 'NestLoop(l s o c)', 'HashJoin(l s o)', 'HashJoin(l s)',
+                     'SeqScan(l)', 'SeqScan(s)', 'SeqScan(o)', 'BitmapScan(c)']
+    assert hint_str == f"/*+ {' '.join(hints)} */"
+    assert list(hint_explanations) == hints
+
+
+def test_scan_hints_are_not_duplicated(qep_data):
+    _, hints, _ = _hints(qep_data)
+
+    scan_hints = [hint for hint in hints if hint.endswith("Scan(l)") or hint.endswith("Scan(s)")
+                  or hint.endswith("Scan(o)") or hint.endswith("Scan(c)")]
+    assert scan_hints == ['SeqScan(l)', 'SeqScan(s)', 'SeqScan(o)', 'BitmapScan(c)']
+    assert len(hints) == len(set(hints))
+
+
+def test_scan_hint_explanations_name_the_table(qep_data):
+    _, _, hint_explanations = _hints(qep_data)
+
+    assert hint_explanations['BitmapScan(c)'] == ("This hint specifies that the optimizer should use a BitmapScan "
+                                                  "on the relation customer with alias c.")
@@ -0,0 +1,38 @@
+from src.custom_types.qep_types import InterJoinOrderModification
+from src.database.qep.qep_modifier import QEPModifier
+from src.database.qep.qep_parser import QEPParser
+
+
+def _parse(qep_data):
+    graph, ordered_relation_pairs, alias_map, _, _ = QEPParser().parse(qep_data, None, None)
+    return graph, ordered_relation_pairs, alias_map
+
+
+def _join_nodes(graph):
+    return [node for node, data in graph.nodes(data=True) if data['_join_or_scan'] == "Join"]
+
+
+def test_inter_join_swap(qep_data):
+    graph, ordered_relation_pairs, alias_map = _parse(qep_data)
+    _, upper_hash_join, lower_hash_join = _join_nodes(graph)
+
+    modifier = QEPModifier(graph, ordered_relation_pairs, alias_map)
+    modifier.add_modification(InterJoinOrderModification(join_node_1_id=upper_hash_join,
+                                                         join_node_2_id=lower_hash_join))
+    modified_graph, _ = modifier.apply_modifications()
+
+    modified_orders = [modified_graph.nodes[node]['join_order'] for node in _join_nodes(modified_graph)]
+    assert modified_orders == ['[[[l, o], s], c]', '[[l, o], s]', '[l, o]']
+
+
+def test_swap_leaves_original_graph(qep_data):
+    graph, ordered_relation_pairs, alias_map = _parse(qep_data)
+    _, upper_hash_join, lower_hash_join = _join_nodes(graph)
+    original_orders = [graph.nodes[node]['join_order'] for node in _join_nodes(graph)]
+
+    modifier = QEPModifier(graph, ordered_relation_pairs, alias_map)
+    modifier.add_modification(InterJoinOrderModification(join_node_1_id=upper_hash_join,
+                                                         join_node_2_id=lower_hash_join))
+    modifier.apply_modifications()
+
+    assert [graph.nodes[node]['join_order'] for node in _join_nodes(graph)] == original_orders
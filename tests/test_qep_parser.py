@@ -0,0 +1,40 @@
+import pytest
+
+from src.database.qep.qep_parser import QEPParser, format_join_order_to_string
+
+
+def _join_orders(graph):
+    return [data['join_order'] for _, data in graph.nodes(data=True) if data['_join_or_scan'] == "Join"]
+
+
+def test_parse_builds_plan_graph(qep_data):
+    parser = QEPParser()
+    graph, ordered_relation_pairs, alias_map, _, _ = parser.parse(qep_data, None, None)
+
+    assert graph.number_of_nodes() == 13
+    assert alias_map == {'l': 'lineitem', 's': 'supplier', 'l2': 'lineitem', 'o': 'orders', 'c': 'customer'}
+    assert [pair for pair, _ in ordered_relation_pairs] == [('l', 's'), ('l', 'o'), ('o', 'c')]
+
+    root = graph.nodes[graph.graph['root']]
+    assert root['node_type'] == "Nested Loop"
+    assert root['is_root']
+    assert _join_orders(graph) == ['[[[l, s], o], c]', '[[l, s], o]', '[l, s]']
+    assert parser.get_total_cost() == pytest.approx(sum(data['cost'] for _, data in graph.nodes(data=True)))
+
+
+def test_parse_on_new_parser_leaves_original_graph(qep_data):
+    parser = QEPParser()
+    graph, *_ = parser.parse(qep_data, None, None)
+    nodes = list(graph.nodes)
+
+    QEPParser().parse(qep_data, None, None)
+
+    assert list(graph.nodes) == nodes
+
+
+def test_format_join_order_to_string():
+    assert format_join_order_to_string(['a', ['b', 'c']]) == "[a, [b, c]]"
+    assert format_join_order_to_string([[['l', 's'], 'o'], 'c']) == "[[[l, s], o], c]"
+    assert format_join_order_to_string('a') == "a"
+    # Aliases are written as is, without JSON escaping
+    assert format_join_order_to_string(['a"b', 'c\\d', 1]) == '[a"b, c\\d, 1]'
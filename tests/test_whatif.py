@@ -0,0 +1,81 @@
+import pytest
+
+from src.whatif import QueryPlanManager
+
+QUERY = "select * from lineitem l, supplier s, orders o, customer c"
+
+
+def _node_ids(graph_dict, join_or_scan):
+    return [node['_id'] for node in graph_dict['nodes'] if node['_join_or_scan'] == join_or_scan]
+
+
+def _join_orders(graph_dict):
+    return [node['join_order'] for node in graph_dict['nodes'] if node['_join_or_scan'] == "Join"]
+
+
+@pytest.fixture
+def manager():
+    return QueryPlanManager()
+
+
+@pytest.fixture
+def plan(manager, db):
+    return manager.generate_plan(QUERY, db)
+
+
+@pytest.fixture
+def join_swap(plan):
+    _, upper_hash_join, lower_hash_join = _node_ids(plan, "Join")
+    return [{"mod_type": "JoinOrderChange", "node_1_id": upper_hash_join, "node_2_id": lower_hash_join}]
+
+
+@pytest.fixture
+def scan_swap(plan):
+    first_scan, second_scan = _node_ids(plan, "Scan")[:2]
+    return [{"mod_type": "JoinOrderChange", "node_1_id": first_scan, "node_2_id": second_scan}]
+
+
+def test_preview_join_swap(manager, plan, join_swap):
+    preview = manager.preview_swap(join_swap)
+
+    assert _join_orders(preview) == ['[[[l, o], s], c]', '[[l, o], s]', '[l, o]']
+    # The original plan is untouched by previews
+    assert _join_orders(manager._convert_graph_to_dict(manager.original_graph)) == _join_orders(plan)
+
+
+def test_preview_scan_swap(manager, scan_swap):
+    preview = manager.preview_swap(scan_swap)
+
+    assert _join_orders(preview)[-1] == '[s, l]'
+
+
+def test_modify_after_preview_matches_modify(db, manager, join_swap):
+    manager.preview_swap(join_swap)
+    previewed = manager.modify_plan(QUERY, join_swap, db)
+
+    # Node ids are generated per parse, so the fresh manager swaps its own copies of the same two joins
+    fresh_manager = QueryPlanManager()
+    _, upper_hash_join, lower_hash_join = _node_ids(fresh_manager.generate_plan(QUERY, db), "Join")
+    fresh = fresh_manager.modify_plan(QUERY, [{"mod_type": "JoinOrderChange", "node_1_id": upper_hash_join,
+                                               "node_2_id": lower_hash_join}], db)
+
+    assert previewed['modified_query'] == fresh['modified_query']
+    assert previewed['hints'] == fresh['hints']
+    assert previewed['modified_query'].startswith("/*+ LEADING((((l o) s) c))")
+
+
+def test_second_modify_keeps_original_plan(db, manager, join_swap, scan_swap):
+    original_cost = manager.original_cost
+    first_preview = manager.preview_swap(join_swap)
+
+    first = manager.modify_plan(QUERY, join_swap, db)
+    # Used to fail with "Node ... not found": the first modify re-parsed into the original plan's parser
+    second = manager.modify_plan(QUERY, scan_swap, db)
+
+    assert first['costs']['original'] == second['costs']['original'] == original_cost
+    assert manager.preview_swap(join_swap) == first_preview
+
+
+def test_invalid_modification_type(manager, plan):
+    with pytest.raises(ValueError, match="Invalid modification type"):
+        manager.preview_swap([{"mod_type": "Unknown"}])